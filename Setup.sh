@@ -81,7 +81,8 @@ EOF
 cat >/etc/systemd/system/telegram-boot-notify.service <<'EOF'
 [Unit]
 Description=Notify Telegram on boot and shutdown
-After=network-online.target
+# Ordered after the bot so that at shutdown we stop (and notify) while it is still running
+After=network-online.target telegram-bot.service
 Wants=network-online.target
 DefaultDependencies=no
 Before=shutdown.target reboot.target halt.target
@@ -1,27 +1,173 @@
 import functools
+import json
 import os
+import time
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
 
 logger = logging.getLogger("tg-shell-bot")
 
-# The decorator needs access to the allowed user ID.
-# It's best to read this from the same central config source.
+# The owner from the env file always has full access.
+# Extra users go in ACL_FILE as JSON mapping user id -> command groups, e.g.
+#   {"123456789": ["avr"], "987654321": ["shell", "files"]}
+# Use "*" as a group to grant everything. The file is re-read when it changes,
+# so edits take effect without restarting the bot.
 ALLOWED_USER_ID = int(os.environ.get("ALLOWED_USER_ID", "0"))
+ACL_FILE = os.environ.get("ACL_FILE", "/etc/telegram-bot/acl.json")
+ACL_RELOAD_SECONDS = float(os.environ.get("ACL_RELOAD_SECONDS", "5"))
 
-def is_allowed(func):
+# Token bucket per user: THROTTLE_BURST requests at once, refilled at
+# THROTTLE_RATE requests per second.
+THROTTLE_RATE = float(os.environ.get("THROTTLE_RATE", "1"))
+THROTTLE_BURST = float(os.environ.get("THROTTLE_BURST", "5"))
+# Users not in the ACL get at most one "Access Denied" per this many seconds
+DENY_REPLY_SECONDS = float(os.environ.get("DENY_REPLY_SECONDS", "60"))
+DENIED_MAX = 1024
+
+ALL_GROUPS = "*"
+
+# user id -> frozenset of groups
+_acl = {}
+_acl_mtime = None
+_acl_checked_at = 0.0
+# user id -> TokenBucket
+_buckets = {}
+# user id -> time of the last denial reply, capped at DENIED_MAX entries
+_denied = {}
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "stamp", "warned")
+
+    def __init__(self):
+        self.tokens = THROTTLE_BURST
+        self.stamp = time.monotonic()
+        self.warned = False
+
+    def consume(self, cost=1.0):
+        now = time.monotonic()
+        self.tokens = min(THROTTLE_BURST, self.tokens + (now - self.stamp) * THROTTLE_RATE)
+        self.stamp = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        self.warned = False
+        return True
+
+
+def _read_acl_file():
+    """Parse ACL_FILE into {user_id: frozenset(groups)}."""
+    with open(ACL_FILE) as f:
+        raw = json.load(f)
+    acl = {}
+    for uid, groups in raw.items():
+        if isinstance(groups, str):
+            groups = [groups]
+        acl[int(uid)] = frozenset(groups)
+    return acl
+
+
+def reload_acl(force=False):
+    """
+    Re-read ACL_FILE if it changed since the last load.
+    A broken file is logged and the previous ACL is kept.
+    """
+    global _acl, _acl_mtime, _acl_checked_at
+    _acl_checked_at = time.monotonic()
+    try:
+        mtime = os.stat(ACL_FILE).st_mtime
+    except FileNotFoundError:
+        mtime = None
+    except OSError as ex:
+        logger.error("Cannot stat ACL file %s: %s", ACL_FILE, ex)
+        return
+    if not force and mtime == _acl_mtime:
+        return
+
+    acl = {}
+    if mtime is not None:
+        try:
+            acl = _read_acl_file()
+        except (OSError, ValueError, TypeError, AttributeError) as ex:
+            logger.error("Invalid ACL file %s, keeping previous ACL: %s", ACL_FILE, ex)
+            # Remember the bad version so it is only re-read once it changes again
+            _acl_mtime = mtime
+            return
+    if ALLOWED_USER_ID:
+        acl[ALLOWED_USER_ID] = frozenset([ALL_GROUPS])
+
+    _acl = acl
+    _acl_mtime = mtime
+    # Drop buckets of users that are no longer in the ACL
+    for uid in list(_buckets):
+        if uid not in acl:
+            del _buckets[uid]
+    logger.info("Loaded ACL with %d user(s)", len(acl))
+
+
+def has_access(uid, group=None):
+    """True if uid may use group (or is in the ACL at all when group is None)."""
+    if time.monotonic() - _acl_checked_at >= ACL_RELOAD_SECONDS:
+        reload_acl()
+    groups = _acl.get(uid)
+    if groups is None:
+        return False
+    return group is None or ALL_GROUPS in groups or group in groups
+
+
+def _should_answer_denial(uid):
+    now = time.monotonic()
+    last = _denied.get(uid)
+    if last is not None and now - last < DENY_REPLY_SECONDS:
+        return False
+    if len(_denied) >= DENIED_MAX:
+        _denied.clear()
+    _denied[uid] = now
+    return True
+
+
+def _bucket(uid):
+    bucket = _buckets.get(uid)
+    if bucket is None:
+        bucket = _buckets[uid] = TokenBucket()
+    return bucket
+
+
+def is_allowed(func=None, *, group=None, throttle=False, cost=1.0):
     """
     Decorator to check if a user is authorized.
+
+    Use bare (@is_allowed) to allow any user in the ACL, or
+    @is_allowed(group="shell") to require a command group.
+    With throttle=True the update is dropped before the handler runs
+    once the user's token bucket is empty.
     """
+    if func is None:
+        return functools.partial(is_allowed, group=group, throttle=throttle, cost=cost)
+
     @functools.wraps(func)
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         uid = update.effective_user.id if update.effective_user else None
-        if uid != ALLOWED_USER_ID:
-            logger.warning("Denied access for user %s", uid)
-            if update.effective_message:
-                await update.effective_message.reply_text("🚫Access Denied.")
+        if not has_access(uid, group):
+            # Answer (and log) a denied user once per DENY_REPLY_SECONDS, drop the rest
+            if _should_answer_denial(uid):
+                logger.warning("Denied access for user %s (group %s)", uid, group)
+                if update.effective_message:
+                    await update.effective_message.reply_text("🚫Access Denied.")
             return
+        if throttle:
+            bucket = _bucket(uid)
+            if not bucket.consume(cost):
+                # Tell the user once per throttled burst, then drop silently
+                if not bucket.warned:
+                    bucket.warned = True
+                    logger.warning("Throttling user %s", uid)
+                    if update.effective_message:
+                        await update.effective_message.reply_text("⏳ Too many requests, slow down.")
+                return
         return await func(update, context, *args, **kwargs)
     return wrapper
 
+
+reload_acl(force=True)
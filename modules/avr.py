@@ -34,13 +34,13 @@ def volume(direction: str) -> str:
         return f"❌ Failed: {e}"
 
 # Command: /avr
-@is_allowed
+@is_allowed(group="avr")
 async def avr_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = get_avr_keyboard()
     await update.message.reply_text("🎧 AVR Control:", reply_markup=reply_markup)
 
 # Handle button presses
-@is_allowed
+@is_allowed(group="avr")
 async def avr_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     data = query.data.split(":")
@@ -14,7 +14,7 @@ SAVE_PATHS = {
     "Drive2️⃣": "/mnt/storage/Drive_2",
 }
 
-@is_allowed
+@is_allowed(group="files", throttle=True)
 async def file_upload_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Step 1: Catches an incoming file and ASKS the user where to save it.
@@ -44,7 +44,7 @@ async def file_upload_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     # Reply to the file message, asking the user to choose a destination
     await update.message.reply_text("Where should I save this file?", reply_markup=reply_markup)
 
-@is_allowed
+@is_allowed(group="files")
 async def file_upload_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Step 2: Handles the button press, retrieves the file info, and performs the download.
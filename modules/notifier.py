@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import socket
+import logging
+
+# Standard library only: notify.py imports this during boot and shutdown,
+# so it must stay cheap to load (no python-telegram-bot here, and asyncio
+# is only imported by the bot-side start_server()).
+
+logger = logging.getLogger("tg-shell-bot")
+
+SOCKET_PATH = os.environ.get("NOTIFY_SOCKET_PATH", "/opt/telegram-bot/notify.sock")
+QUEUE_PATH = os.environ.get("NOTIFY_QUEUE_PATH", "/opt/telegram-bot/notify-queue.jsonl")
+SOCKET_TIMEOUT = float(os.environ.get("NOTIFY_SOCKET_TIMEOUT", "10"))
+
+
+# -------------------------
+# Offline queue
+# -------------------------
+def enqueue(text, ts=None):
+    """Append a message to the on-disk queue and fsync it."""
+    line = json.dumps({"ts": ts or time.time(), "text": text}) + "\n"
+    fd = os.open(QUEUE_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        if os.geteuid() == 0:
+            # notify.py runs as root under systemd; hand the file to the
+            # bot's user so it can append to it too
+            st = os.stat(os.path.dirname(QUEUE_PATH) or ".")
+            os.fchown(fd, st.st_uid, st.st_gid)
+        os.write(fd, line.encode())
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+DRAINING_PATH = QUEUE_PATH + ".draining"
+
+
+def _read_queue(path):
+    items = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                items.append((entry.get("ts"), entry["text"]))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # A torn last line from a power cut, or not a JSON object
+                logger.warning("Skipping bad queue line: %r", line)
+    return items
+
+
+def take_queued():
+    """
+    Take queued messages, oldest first, as (ts, text) tuples.
+    The queue file is moved aside to DRAINING_PATH before reading so
+    concurrent enqueue() calls start a fresh file instead of being lost.
+    If a previous drain was interrupted its file is returned first and the
+    live queue is left for the next call. Call finish_drain() once every
+    item has been sent, or restore_draining() with the ones that were not.
+    """
+    if not os.path.exists(DRAINING_PATH):
+        try:
+            os.rename(QUEUE_PATH, DRAINING_PATH)
+        except FileNotFoundError:
+            return []
+    return _read_queue(DRAINING_PATH)
+
+
+def restore_draining(items):
+    """
+    Replace DRAINING_PATH with the (ts, text) items that could not be sent,
+    so they stay ahead of anything enqueued since and the next take_queued()
+    returns them first.
+    """
+    tmp = DRAINING_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        for ts, text in items:
+            f.write(json.dumps({"ts": ts, "text": text}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, DRAINING_PATH)
+
+
+def finish_drain():
+    """Forget the messages handed out by take_queued()."""
+    try:
+        os.unlink(DRAINING_PATH)
+    except FileNotFoundError:
+        pass
+
+
+# -------------------------
+# Client side (notify.py)
+# -------------------------
+def send_via_socket(text, timeout=SOCKET_TIMEOUT):
+    """
+    Hand a message to the running bot. Returns True once the bot has
+    taken responsibility for it (sent or queued on its side).
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(SOCKET_PATH)
+            s.sendall(json.dumps({"ts": time.time(), "text": text}).encode() + b"\n")
+            s.shutdown(socket.SHUT_WR)
+            return s.recv(16).strip() == b"ok"
+    except OSError:
+        return False
+
+
+def notify(text):
+    """Deliver through the running bot if possible, otherwise queue for next startup."""
+    if send_via_socket(text):
+        return "delivered"
+    enqueue(text)
+    return "queued"
+
+
+# -------------------------
+# Server side (running bot)
+# -------------------------
+async def start_server(deliver, pending):
+    """
+    Listen on SOCKET_PATH and pass each (ts, text) to the async deliver()
+    callable, run as a background task. Tasks still running are kept in the
+    caller's pending dict (task -> (ts, text)) so shutdown can wait for
+    them or queue them. Returns the asyncio server; close it on shutdown.
+    """
+    import asyncio
+
+    async def handle(reader, writer):
+        try:
+            line = await reader.readline()
+            entry = json.loads(line)
+            ts, text = entry.get("ts"), entry["text"]
+            # Acknowledge before delivering so notify.py never waits on the
+            # network; deliver() is responsible for re-queueing on failure.
+            writer.write(b"ok\n")
+            await writer.drain()
+        except Exception as ex:
+            logger.exception("notify socket error: %s", ex)
+            return
+        finally:
+            writer.close()
+        task = asyncio.create_task(deliver(ts, text))
+        pending[task] = (ts, text)
+        task.add_done_callback(lambda t: pending.pop(t, None))
+
+    try:
+        os.unlink(SOCKET_PATH)
+    except FileNotFoundError:
+        pass
+    server = await asyncio.start_unix_server(handle, path=SOCKET_PATH)
+    os.chmod(SOCKET_PATH, 0o600)
+    return server
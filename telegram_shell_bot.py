@@ -15,8 +15,9 @@ import fcntl
 import termios
 import errno
 import json
+import asyncio
 from queue import Queue, Empty
-from modules import avr, file_uploader
+from modules import avr, file_uploader, notifier
 from modules.auth import is_allowed
 from modules.weather import weather_report_job
 
@@ -56,7 +57,7 @@ logger = logging.getLogger("tg-shell-bot")
 # -------------------------
 # Single-command execution
 # -------------------------
-@is_allowed
+@is_allowed(group="shell", throttle=True)
 async def cmd_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Usage: /cmd ls -la /etc"""
     text = update.message.text or ""
@@ -81,6 +82,8 @@ async def cmd_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # PTY-backed interactive-ish shell
 # -------------------------
 # We'll manage a single session per bot instance (you can expand to multiple).
+# The session belongs to the user who ran /st: only they can type into it,
+# stop or flush it, and its output goes to their chat.
 pty_proc = None
 pty_master_fd = None
 pty_lock = threading.Lock()
@@ -88,9 +91,10 @@ read_thread = None
 read_stop = threading.Event()
 output_queue = Queue()
 session_open = False
+session_owner = None
 
-def spawn_pty_shell(shell="/bin/bash"):
-    global pty_proc, pty_master_fd, read_thread, read_stop, session_open
+def spawn_pty_shell(owner, shell="/bin/bash"):
+    global pty_proc, pty_master_fd, read_thread, read_stop, session_open, session_owner
     if session_open:
         return False, "session already open"
     import pty, os
@@ -108,6 +112,7 @@ def spawn_pty_shell(shell="/bin/bash"):
     read_thread.daemon = True
     read_thread.start()
     session_open = True
+    session_owner = owner
     return True, "spawned"
 
 def _pty_reader():
@@ -138,7 +143,7 @@ def write_to_pty(s):
         return False, str(ex)
 
 def stop_pty():
-    global pty_proc, pty_master_fd, read_stop, session_open
+    global pty_proc, pty_master_fd, read_stop, session_open, session_owner
     read_stop.set()
     try:
         if pty_proc:
@@ -156,9 +161,16 @@ def stop_pty():
     pty_proc = None
     pty_master_fd = None
     session_open = False
+    session_owner = None
+    # Don't hand the old session's output to whoever opens the next one
+    while True:
+        try:
+            output_queue.get_nowait()
+        except Empty:
+            break
 
 # background task: flush output_queue -> send DM
-async def flush_output(bot: Bot):
+async def flush_output(bot: Bot, chat_id):
     text_parts = []
     while True:
         try:
@@ -172,31 +184,39 @@ async def flush_output(bot: Bot):
     # chunk
     for chunk in [combined[i:i+3800] for i in range(0, len(combined), 3800)]:
         try:
-            await bot.send_message(chat_id=CHAT_ID, text=f"```\n{chunk}\n```", parse_mode="MarkdownV2")
+            await bot.send_message(chat_id=chat_id, text=f"```\n{chunk}\n```", parse_mode="MarkdownV2")
         except Exception as ex:
             logger.exception("failed to send chunk: %s", ex)
 
+def _owns_session(update: Update):
+    return update.effective_user is not None and update.effective_user.id == session_owner
+
 # command handlers for starting/stopping shell
-@is_allowed
+@is_allowed(group="shell", throttle=True)
 async def shell_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    ok, msg = spawn_pty_shell()
+    ok, msg = spawn_pty_shell(update.effective_user.id)
     if not ok:
         await update.message.reply_text(f"Failed: {msg}")
         return
     await update.message.reply_text("Shell session started. Send messages and they will be written to the shell STDIN. Use /sp to close. Prefix lines with `\\n` to send newline if needed.")
 
-@is_allowed
+@is_allowed(group="shell")
 async def shell_stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if session_open and not _owns_session(update):
+        await update.message.reply_text("Shell session belongs to another user.")
+        return
     stop_pty()
     await update.message.reply_text("Shell session stopped.")
 
 # messages while session open are forwarded to PTY stdin
-@is_allowed
 async def relay_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    global session_open
-    if not session_open:
-        # not a shell message; ignore or echo
+    if not session_open or not _owns_session(update):
+        # not a shell message; ignore without charging the user's throttle budget
         return
+    await _relay_to_pty(update, context)
+
+@is_allowed(group="shell", throttle=True)
+async def _relay_to_pty(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text or ""
     # by default send the message followed by newline
     # if user wants to send raw without newline, support prefix "RAW:" for example
@@ -208,35 +228,130 @@ async def relay_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not ok:
         await update.message.reply_text(f"write failed: {err}")
     # flush any immediate output
-    await flush_output(context.bot)
+    await flush_output(context.bot, update.effective_chat.id)
 
 # manual flush command (in case you want to pull pending output)
-@is_allowed
+@is_allowed(group="shell")
 async def flush_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await flush_output(context.bot)
+    if not _owns_session(update):
+        await update.message.reply_text("No shell session of yours is open.")
+        return
+    await flush_output(context.bot, update.effective_chat.id)
 # -------------------------
 # AVR command wrappers
 # -------------------------
-@is_allowed
+@is_allowed(group="avr")
 async def avr_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await avr.menu(update, context)
 
-@is_allowed
+@is_allowed(group="avr")
 async def avr_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await avr.callback(update, context)
 # -------------------------
 # Boot/shutdown notification helpers
 # -------------------------
-def send_startup_message(text):
-    # This is synchronous helper to be used by systemd scripts that call the bot script with an arg, or we can use the live bot to send message.
+# notify.py hands boot/shutdown events to us over a unix socket, or leaves
+# them in an on-disk queue that is drained here at startup. While anything
+# is left in the queue a job retries it with backoff.
+NOTIFY_RETRY_SECONDS = 30
+NOTIFY_RETRY_MAX_SECONDS = 900
+NOTIFY_STOP_TIMEOUT = 5
+
+notify_lock = asyncio.Lock()
+# socket deliveries still in flight: task -> (ts, text)
+notify_pending = {}
+
+async def send_notification(bot: Bot, text, ts=None, requeue=True):
+    """Send a notification to CHAT_ID; on failure put it back in the queue."""
+    body = text
+    if ts and time.time() - ts > 60:
+        body += "\n🕒 " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
     try:
-        b = Bot(BOT_TOKEN)
-        b.send_message(chat_id=CHAT_ID, text=text)
+        await bot.send_message(chat_id=CHAT_ID, text=body)
         return True
     except Exception as ex:
-        logger.exception("failed startup notify: %s", ex)
+        logger.exception("failed to send notification: %s", ex)
+        if requeue:
+            notifier.enqueue(text, ts)
         return False
 
+async def drain_notifications(bot: Bot):
+    """Send everything queued, oldest first. Returns True once the queue is empty."""
+    async with notify_lock:
+        # An interrupted drain's leftovers first, then the live queue
+        for _ in range(2):
+            items = notifier.take_queued()
+            for i, (ts, text) in enumerate(items):
+                if not await send_notification(bot, text, ts, requeue=False):
+                    # Network is likely down; keep the unsent ones ahead of newer messages
+                    notifier.restore_draining(items[i:])
+                    return False
+            notifier.finish_drain()
+    return True
+
+def schedule_notify_retry(application, delay=NOTIFY_RETRY_SECONDS):
+    if application.job_queue is None:
+        logger.warning("No job queue; queued notifications wait for the next startup")
+        return
+    if application.job_queue.get_jobs_by_name("notify_retry"):
+        return
+    application.job_queue.run_once(retry_notifications, delay, data=delay, name="notify_retry")
+
+async def retry_notifications(context: ContextTypes.DEFAULT_TYPE):
+    try:
+        drained = await drain_notifications(context.bot)
+    except Exception as ex:
+        logger.exception("failed to drain notification queue %s: %s", notifier.QUEUE_PATH, ex)
+        drained = False
+    if not drained:
+        delay = min(context.job.data * 2, NOTIFY_RETRY_MAX_SECONDS)
+        context.job_queue.run_once(retry_notifications, delay, data=delay, name="notify_retry")
+
+async def notifier_startup(application):
+    bot = application.bot
+
+    async def deliver(ts, text):
+        try:
+            # Anything queued just before the socket came up goes out first
+            if await drain_notifications(bot):
+                if await send_notification(bot, text, ts):
+                    return
+            else:
+                notifier.enqueue(text, ts)
+            schedule_notify_retry(application)
+        except Exception as ex:
+            logger.exception("failed to deliver notification: %s", ex)
+
+    try:
+        application.bot_data["notify_server"] = await notifier.start_server(deliver, notify_pending)
+    except OSError as ex:
+        logger.exception("failed to open notify socket %s: %s", notifier.SOCKET_PATH, ex)
+    try:
+        if not await drain_notifications(bot):
+            schedule_notify_retry(application)
+    except Exception as ex:
+        logger.exception("failed to drain notification queue %s: %s", notifier.QUEUE_PATH, ex)
+
+# Runs as post_stop, while the bot's HTTP client is still open
+async def notifier_stop(application):
+    server = application.bot_data.pop("notify_server", None)
+    if server:
+        server.close()
+        await server.wait_closed()
+        try:
+            os.unlink(notifier.SOCKET_PATH)
+        except OSError:
+            pass
+    if not notify_pending:
+        return
+    # Give in-flight deliveries (e.g. the shutdown notice) a moment, queue the rest
+    _, unfinished = await asyncio.wait(list(notify_pending), timeout=NOTIFY_STOP_TIMEOUT)
+    for task in unfinished:
+        ts, text = notify_pending.pop(task)
+        task.cancel()
+        notifier.enqueue(text, ts)
+        logger.warning("Queued undelivered notification for next startup: %s", text)
+
 # -------------------------
 # Weather check function
 # -------------------------
@@ -249,6 +364,8 @@ def main():
         .token(BOT_TOKEN)
         .base_url("http://127.0.0.1:8081/bot")
         .base_file_url("http://127.0.0.1:8081/file/bot")
+        .post_init(notifier_startup)
+        .post_stop(notifier_stop)
         .build()
     )
     #testing
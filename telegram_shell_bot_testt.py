@@ -7,6 +7,7 @@ from telegram.ext import (
 )
 from apscheduler.schedulers.background import BackgroundScheduler
 from modules import avr
+from modules.auth import is_allowed
 
 logging.basicConfig(level=logging.INFO)
 
@@ -17,15 +18,9 @@ LAT = os.environ["LAT"]
 LON = os.environ["LON"]
 POLL_MIN = int(os.environ["WEATHER_POLL_MINUTES"])
 
-# Auth check
-def allowed(user_id: int) -> bool:
-    return user_id == ALLOWED_USER_ID
-
 # --- Shell Command Handler ---
+@is_allowed(group="shell", throttle=True)
 async def shell(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not allowed(update.effective_user.id):
-        return await update.message.reply_text("⛔ Unauthorized")
-
     cmd = " ".join(context.args)
     if not cmd:
         return await update.message.reply_text("Usage: /sh <command>")
@@ -51,9 +46,8 @@ async def weather_job(app):
         logging.error(f"Weather fetch failed: {e}")
 
 # --- Start Command ---
+@is_allowed
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not allowed(update.effective_user.id):
-        return await update.message.reply_text("⛔ Unauthorized")
     await update.message.reply_text("🤖 Bot ready. Use /sh, /avr")
 
 # --- Main ---